@@ -1,29 +1,62 @@
+import hmac
 import os
+from functools import lru_cache
+from types import MappingProxyType
+from pathlib import Path
+from typing import List, Mapping
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Local directory for uploaded media, served under /uploads (created at startup)
+UPLOAD_DIR = Path("uploads")
+# Media files are copied to and from disk in chunks of this size to keep memory use bounded
+MEDIA_CHUNK_SIZE = 1 << 20  # 1 MiB
+
 class Settings:
     """Application settings loaded from environment variables."""
-    
-    # WhatsApp Business API Configuration
-    WHATSAPP_PHONE_NUMBER_ID: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
-    WHATSAPP_ACCESS_TOKEN: str = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
-    WHATSAPP_WEBHOOK_VERIFY_TOKEN: str = os.getenv("WHATSAPP_WEBHOOK_VERIFY_TOKEN", "")
-    WHATSAPP_API_BASE_URL: str = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com/v18.0")
-    
-    # Server Configuration
-    HOST: str = os.getenv("HOST", "0.0.0.0")
-    PORT: int = int(os.getenv("PORT", "8000"))
-    DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
-    
-    # Media Configuration
-    MEDIA_BASE_URL: str = os.getenv("MEDIA_BASE_URL", "")
-    
+
     # API Configuration
     API_V1_STR: str = "/api/v1"
-    
+
+    def __init__(self):
+        # WhatsApp Business API Configuration
+        self.WHATSAPP_PHONE_NUMBER_ID: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
+        self.WHATSAPP_ACCESS_TOKEN: str = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
+        self.WHATSAPP_WEBHOOK_VERIFY_TOKEN: str = os.getenv("WHATSAPP_WEBHOOK_VERIFY_TOKEN", "")
+        self.WHATSAPP_API_BASE_URL: str = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com/v18.0")
+
+        # Server Configuration
+        self.HOST: str = os.getenv("HOST", "0.0.0.0")
+        self.PORT: int = int(os.getenv("PORT", "8000"))
+        self.DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
+        # Received messages are stored in process memory, so each worker has its own copy
+        self.WORKERS: int = int(os.getenv("WORKERS", "1"))
+
+        # Comma-separated list of origins allowed to call the API from a browser
+        self.CORS_ORIGINS: List[str] = [
+            origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()
+        ]
+
+        # Media Configuration
+        self.MEDIA_BASE_URL: str = os.getenv("MEDIA_BASE_URL", "")
+
+        # Storage Configuration
+        # Maximum number of received messages kept in memory; the oldest are evicted first
+        self.MAX_RECEIVED_MESSAGES: int = int(os.getenv("MAX_RECEIVED_MESSAGES", "10000"))
+        if self.MAX_RECEIVED_MESSAGES < 1:
+            raise ValueError(f"MAX_RECEIVED_MESSAGES must be at least 1, got {self.MAX_RECEIVED_MESSAGES}")
+
+        # Encoded once for constant-time comparison during webhook verification
+        self._webhook_verify_token: bytes = self.WHATSAPP_WEBHOOK_VERIFY_TOKEN.encode()
+
+        # Headers never change for the lifetime of the settings, so build them once
+        self._headers: Mapping[str, str] = MappingProxyType({
+            "Authorization": f"Bearer {self.WHATSAPP_ACCESS_TOKEN}",
+            "Content-Type": "application/json"
+        })
+
     def validate_whatsapp_config(self) -> bool:
         """Validate that all required WhatsApp configuration is present."""
         required_fields = [
@@ -32,13 +65,25 @@ class Settings:
             self.WHATSAPP_WEBHOOK_VERIFY_TOKEN
         ]
         return all(field for field in required_fields)
-    
-    def get_whatsapp_headers(self) -> dict:
-        """Get headers for WhatsApp API requests."""
-        return {
-            "Authorization": f"Bearer {self.WHATSAPP_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        }
+
+    def check_webhook_verify_token(self, token: str) -> bool:
+        """Check a webhook verification token in constant time (always fails if unset)."""
+        return bool(self._webhook_verify_token) and hmac.compare_digest(
+            token.encode(), self._webhook_verify_token
+        )
+
+    def get_media_base_url(self) -> str:
+        """Get the public base URL for media files, falling back to localhost."""
+        return self.MEDIA_BASE_URL.rstrip('/') or f"http://localhost:{self.PORT}"
+
+    def get_whatsapp_headers(self) -> Mapping[str, str]:
+        """Get headers for WhatsApp API requests (read-only)."""
+        return self._headers
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the cached application settings."""
+    return Settings()
 
 # Global settings instance
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
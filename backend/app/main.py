@@ -1,13 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from typing import Optional
+import hashlib
 import logging
+import orjson
 import uvicorn
 import os
 
-from .config import settings
+from .config import UPLOAD_DIR, get_settings
 from .routes import messages, webhooks
+from .services.whatsapp import WhatsAppService, create_http_client
 
 # Configure logging
 logging.basicConfig(
@@ -16,98 +21,119 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown."""
+    logger.info("Starting WhatsApp Messaging Utility...")
+    
+    # Validate configuration
+    if not settings.validate_whatsapp_config():
+        logger.error("WhatsApp configuration is incomplete!")
+        logger.error("Please check your environment variables:")
+        logger.error(f"  WHATSAPP_PHONE_NUMBER_ID: {'✓' if settings.WHATSAPP_PHONE_NUMBER_ID else '✗'}")
+        logger.error(f"  WHATSAPP_ACCESS_TOKEN: {'✓' if settings.WHATSAPP_ACCESS_TOKEN else '✗'}")
+        logger.error(f"  WHATSAPP_WEBHOOK_VERIFY_TOKEN: {'✓' if settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN else '✗'}")
+    else:
+        logger.info("WhatsApp configuration validated successfully")
+    
+    # One pooled HTTP client for all WhatsApp API requests, owned by the service
+    app.state.whatsapp = WhatsAppService(client=create_http_client(settings))
+    
+    yield
+    
+    logger.info("Shutting down WhatsApp Messaging Utility...")
+    await app.state.whatsapp.close()
+
 # Create FastAPI app
 app = FastAPI(
     title="WhatsApp Messaging Utility",
     description="A utility for sending and receiving WhatsApp messages via Business API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your frontend domain
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=settings.CORS_ORIGINS,  # In production, set CORS_ORIGINS to your frontend domain
+    allow_credentials=False,  # The API does not use cookies
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Mount static files for uploaded media
-uploads_dir = "uploads"
-os.makedirs(uploads_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # Include routers
 app.include_router(messages.router)
 app.include_router(webhooks.router)
 
-@app.on_event("startup")
-async def startup_event():
-    """Application startup event."""
-    logger.info("Starting WhatsApp Messaging Utility...")
-    
-    # Validate configuration
-    if not settings.validate_whatsapp_config():
-        logger.error("WhatsApp configuration is incomplete!")
-        logger.error("Please check your environment variables:")
-        logger.error(f"  WHATSAPP_PHONE_NUMBER_ID: {'✓' if settings.WHATSAPP_PHONE_NUMBER_ID else '✗'}")
-        logger.error(f"  WHATSAPP_ACCESS_TOKEN: {'✓' if settings.WHATSAPP_ACCESS_TOKEN else '✗'}")
-        logger.error(f"  WHATSAPP_WEBHOOK_VERIFY_TOKEN: {'✓' if settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN else '✗'}")
-    else:
-        logger.info("WhatsApp configuration validated successfully")
+# Bodies of responses that cannot change while the process runs, serialized once.
+# A new Response is built per request because middleware may modify its headers.
+_ROOT_BODY = orjson.dumps({
+    "message": "WhatsApp Messaging Utility API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "status": "running"
+})
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Application shutdown event."""
-    logger.info("Shutting down WhatsApp Messaging Utility...")
+_HEALTH_BODY = orjson.dumps({
+    "status": "healthy",
+    "whatsapp_configured": settings.validate_whatsapp_config()
+})
+
+_CONFIG_BODY = orjson.dumps({
+    "phone_number_id_set": bool(settings.WHATSAPP_PHONE_NUMBER_ID),
+    "access_token_set": bool(settings.WHATSAPP_ACCESS_TOKEN),
+    "webhook_verify_token_set": bool(settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN),
+    "api_base_url": settings.WHATSAPP_API_BASE_URL,
+    "host": settings.HOST,
+    "port": settings.PORT,
+    "debug": settings.DEBUG
+})
+_CONFIG_ETAG = f'"{hashlib.blake2b(_CONFIG_BODY, digest_size=8).hexdigest()}"'
 
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {
-        "message": "WhatsApp Messaging Utility API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "status": "running"
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "whatsapp_configured": settings.validate_whatsapp_config()
-    }
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 @app.get("/config")
-async def get_config():
+async def get_config(if_none_match: Optional[str] = Header(None)):
     """Get configuration status (without sensitive data)."""
-    return {
-        "phone_number_id_set": bool(settings.WHATSAPP_PHONE_NUMBER_ID),
-        "access_token_set": bool(settings.WHATSAPP_ACCESS_TOKEN),
-        "webhook_verify_token_set": bool(settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN),
-        "api_base_url": settings.WHATSAPP_API_BASE_URL,
-        "host": settings.HOST,
-        "port": settings.PORT,
-        "debug": settings.DEBUG
-    }
+    if messages.etag_matches(if_none_match, _CONFIG_ETAG):
+        return Response(status_code=304, headers={"ETag": _CONFIG_ETAG})
+    return Response(content=_CONFIG_BODY, media_type="application/json", headers={"ETag": _CONFIG_ETAG})
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler."""
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
 
 if __name__ == "__main__":
     uvicorn.run(
-        "main:app",
+        "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
+        loop="uvloop",
+        http="httptools",
+        # reload and multiple workers are mutually exclusive
+        workers=1 if settings.DEBUG else settings.WORKERS,
         reload=settings.DEBUG,
         log_level="info"
     )
\ No newline at end of file
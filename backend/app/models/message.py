@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List
+import msgspec
 from datetime import datetime
 from enum import Enum
 
@@ -41,30 +42,58 @@ class ReceivedMessage(BaseModel):
     text: Optional[str] = Field(None, description="Text content")
     media_url: Optional[str] = Field(None, description="URL of media file")
     media_id: Optional[str] = Field(None, description="WhatsApp media ID")
-    timestamp: datetime = Field(..., description="Message timestamp")
+    timestamp: int = Field(..., description="Message timestamp (Unix epoch seconds)")
     status: MessageStatus = Field(default=MessageStatus.DELIVERED, description="Message status")
 
-class WebhookMessage(BaseModel):
+    @property
+    def timestamp_dt(self) -> datetime:
+        """Message timestamp as a local datetime."""
+        return datetime.fromtimestamp(self.timestamp)
+
+# Webhook payloads are decoded with msgspec, which parses and validates them in a single pass.
+# Fields not listed here (e.g. status updates, contacts) are ignored during decoding.
+
+class WebhookText(msgspec.Struct, frozen=True):
+    """Text content of a webhook message."""
+    body: str = ""
+
+class WebhookMedia(msgspec.Struct, frozen=True):
+    """Media content of a webhook message."""
+    id: str = ""
+    link: str = ""
+    caption: str = ""
+    mime_type: Optional[str] = None
+
+class WebhookMessage(msgspec.Struct, frozen=True):
     """Model for webhook message data."""
-    id: str
-    from_: str = Field(alias="from")
-    timestamp: str
-    type: str
-    text: Optional[Dict[str, Any]] = None
-    audio: Optional[Dict[str, Any]] = None
-    document: Optional[Dict[str, Any]] = None
-    image: Optional[Dict[str, Any]] = None
-    video: Optional[Dict[str, Any]] = None
+    id: str = ""
+    from_: str = msgspec.field(default="", name="from")
+    timestamp: str = ""
+    type: str = "text"
+    text: Optional[WebhookText] = None
+    audio: Optional[WebhookMedia] = None
+    document: Optional[WebhookMedia] = None
+    image: Optional[WebhookMedia] = None
+    video: Optional[WebhookMedia] = None
+
+class WebhookValue(msgspec.Struct, frozen=True):
+    """Model for webhook change value data."""
+    messages: List[WebhookMessage] = []
+
+class WebhookChange(msgspec.Struct, frozen=True):
+    """Model for webhook change data."""
+    field: str = ""
+    value: WebhookValue = msgspec.field(default_factory=WebhookValue)
 
-class WebhookEntry(BaseModel):
+class WebhookEntry(msgspec.Struct, frozen=True):
     """Model for webhook entry data."""
-    id: str
-    changes: List[Dict[str, Any]]
+    id: str = ""
+    changes: List[WebhookChange] = []
 
-class WebhookData(BaseModel):
+class WebhookData(msgspec.Struct, frozen=True):
     """Model for webhook data."""
-    object: str
-    entry: List[WebhookEntry]
+    object: str = ""
+    entry: List[WebhookEntry] = []
 
 class MessageListResponse(BaseModel):
     """Response model for listing messages."""
@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, UploadFile, File, Form
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+from collections import deque
+from itertools import islice
+import asyncio
 import logging
+import os
+import uuid
+import aiofiles
+import orjson
 
+from ..config import MEDIA_CHUNK_SIZE, UPLOAD_DIR, Settings, get_settings
 from ..models.message import (
     SendMessageRequest, 
     SendMessageResponse, 
@@ -9,16 +18,34 @@ from ..models.message import (
     ReceivedMessage,
     MessageType
 )
-from ..services.whatsapp import whatsapp_service
+from ..services.whatsapp import WhatsAppService, get_whatsapp_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
-# In-memory storage for received messages (in production, use a database)
-received_messages: List[ReceivedMessage] = []
+# In-memory storage for received messages (in production, use a database).
+# A bounded deque appends in O(1) without list resizing and evicts the oldest messages.
+received_messages: Deque[ReceivedMessage] = deque(maxlen=get_settings().MAX_RECEIVED_MESSAGES)
+# Index of received messages by message ID for O(1) lookups
+_message_index: Dict[str, ReceivedMessage] = {}
+
+# Incremented on every stored message; part of the ETag of message list responses
+_messages_version = 0
+# Differs per process, so ETags from before a restart never match
+_ETAG_PREFIX = uuid.uuid4().hex[:8]
+
+# Queues of connected /stream clients; add_received_message pushes new messages to each
+_subscribers: Set["asyncio.Queue[ReceivedMessage]"] = set()
+# Messages buffered per stream client before it is considered too slow and skipped
+STREAM_QUEUE_SIZE = 1000
+# Seconds between keep-alive comments on an idle stream
+STREAM_PING_INTERVAL = 15
 
 @router.post("/send", response_model=SendMessageResponse)
-async def send_message(request: SendMessageRequest):
+async def send_message(
+    request: SendMessageRequest,
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
+):
     """Send a message via WhatsApp."""
     try:
         if request.message_type == MessageType.TEXT:
@@ -53,7 +80,8 @@ async def send_message(request: SendMessageRequest):
 @router.post("/send-text")
 async def send_text_message(
     to: str = Form(..., description="WhatsApp phone number (with country code, no +)"),
-    text: str = Form(..., description="Text message content")
+    text: str = Form(..., description="Text message content"),
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
 ):
     """Send a text message via WhatsApp (form data)."""
     try:
@@ -68,7 +96,8 @@ async def send_media_message(
     to: str = Form(..., description="WhatsApp phone number (with country code, no +)"),
     media_type: str = Form(..., description="Media type: audio, document, image, video"),
     media_url: str = Form(..., description="URL of the media file"),
-    caption: Optional[str] = Form(None, description="Caption for the media")
+    caption: Optional[str] = Form(None, description="Caption for the media"),
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
 ):
     """Send a media message via WhatsApp (form data)."""
     try:
@@ -86,28 +115,99 @@ async def send_media_message(
         logger.error(f"Error sending media message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an If-None-Match header value matches an ETag."""
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
 @router.get("/", response_model=MessageListResponse)
-async def get_messages(limit: int = 50, offset: int = 0):
+async def get_messages(
+    limit: int = Query(50, ge=0),
+    offset: int = Query(0, ge=0),
+    if_none_match: Optional[str] = Header(None)
+):
     """Get received messages."""
+    # The page only changes when a message is stored, so clients can poll with If-None-Match
+    etag = f'"{_ETAG_PREFIX}-{_messages_version}-{offset}-{limit}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     try:
-        # In production, you would query a database here
-        messages = received_messages[offset:offset + limit]
-        return MessageListResponse(
-            messages=messages,
-            total=len(received_messages)
-        )
+        # In production, you would query a database here.
+        # Deques do not support slicing; iterate over only the requested page.
+        messages = islice(received_messages, offset, offset + limit)
+        # Stored messages are already valid; returning a response directly skips
+        # FastAPI's response_model validation (the model is kept for the API docs)
+        return ORJSONResponse({
+            "messages": [message.model_dump() for message in messages],
+            "total": len(received_messages)
+        }, headers={"ETag": etag})
     except Exception as e:
         logger.error(f"Error getting messages: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _messages_after(since_id: Optional[str]) -> List[ReceivedMessage]:
+    """Stored messages received after since_id (all of them if since_id is unknown)."""
+    if since_id is None:
+        return []
+    if since_id not in _message_index:
+        return list(received_messages)
+    
+    backlog: List[ReceivedMessage] = []
+    for message in reversed(received_messages):
+        if message.message_id == since_id:
+            break
+        backlog.append(message)
+    backlog.reverse()
+    return backlog
+
+def _sse_event(message: ReceivedMessage) -> bytes:
+    """Encode a message as a Server-Sent Event."""
+    return b"id: %s\ndata: %s\n\n" % (message.message_id.encode(), orjson.dumps(message.model_dump()))
+
+# Declared before /{message_id} so "stream" is not taken for a message ID
+@router.get("/stream")
+async def stream_messages(since: Optional[str] = None):
+    """Stream received messages as Server-Sent Events.
+    
+    Messages received after the ``since`` message ID are sent first, then new
+    messages as they arrive.
+    """
+    async def events() -> AsyncIterator[bytes]:
+        queue: "asyncio.Queue[ReceivedMessage]" = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        # Subscribing and taking the backlog happen without awaiting in between,
+        # so no message can be missed or sent twice
+        _subscribers.add(queue)
+        backlog = _messages_after(since)
+        try:
+            for message in backlog:
+                yield _sse_event(message)
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Comment line to keep proxies from closing an idle connection
+                    yield b": ping\n\n"
+                    continue
+                yield _sse_event(message)
+        finally:
+            _subscribers.discard(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{message_id}")
 async def get_message(message_id: str):
     """Get a specific message by ID."""
     try:
-        for message in received_messages:
-            if message.message_id == message_id:
-                return message
-        raise HTTPException(status_code=404, detail="Message not found")
+        message = _message_index.get(message_id)
+        if message is None:
+            raise HTTPException(status_code=404, detail="Message not found")
+        return message
     except HTTPException:
         raise
     except Exception as e:
@@ -117,60 +217,59 @@ async def get_message(message_id: str):
 @router.get("/media/test/{filename}")
 async def test_media_access(filename: str):
     """Test if a media file is accessible."""
-    import os
-    file_path = os.path.join("uploads", filename)
-    if os.path.exists(file_path):
-        return {"status": "accessible", "file_path": file_path}
+    file_path = UPLOAD_DIR / filename
+    if file_path.exists():
+        return {"status": "accessible", "file_path": str(file_path)}
     else:
-        return {"status": "not_found", "file_path": file_path}
+        return {"status": "not_found", "file_path": str(file_path)}
+
+async def _store_upload(file: UploadFile, settings: Settings) -> Tuple[str, int]:
+    """Save an uploaded file to local storage and return its public URL and size."""
+    # Generate unique filename
+    file_extension = os.path.splitext(file.filename or "")[1]  # includes the dot, or ""
+    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+    file_path = UPLOAD_DIR / unique_filename
+    
+    # Stream file to disk
+    file_size = 0
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(MEDIA_CHUNK_SIZE):
+            await buffer.write(chunk)
+            file_size += len(chunk)
+    
+    # Generate accessible URL
+    # For WhatsApp to access files, we need a public URL
+    # Use configured media base URL if available, otherwise fallback to localhost
+    base_url = settings.get_media_base_url()
+    if settings.MEDIA_BASE_URL:
+        logger.info(f"Using configured media base URL: {base_url}")
+    else:
+        logger.warning(f"Using localhost URL: {base_url}")
+        logger.warning("IMPORTANT: Set MEDIA_BASE_URL in .env to your ngrok URL for WhatsApp to access files")
+    
+    media_url = f"{base_url}/uploads/{unique_filename}"
+    
+    # Log the URL for debugging
+    logger.info(f"Generated media URL: {media_url}")
+    
+    logger.info(f"File uploaded successfully: {file_path}")
+    
+    return media_url, file_size
 
 @router.post("/media/upload")
-async def upload_media(file: UploadFile = File(...)):
+async def upload_media(
+    file: UploadFile = File(...),
+    settings: Settings = Depends(get_settings)
+):
     """Upload a media file and return its URL."""
     try:
-        import os
-        import uuid
-        from datetime import datetime
-        
-        # Create uploads directory if it doesn't exist
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Generate accessible URL
-        # For WhatsApp to access files, we need a public URL
-        from ..config import settings
-        
-        # Use configured media base URL if available, otherwise fallback to localhost
-        if settings.MEDIA_BASE_URL:
-            base_url = settings.MEDIA_BASE_URL.rstrip('/')
-            logger.info(f"Using configured media base URL: {base_url}")
-        else:
-            base_url = f"http://localhost:{settings.PORT}"
-            logger.warning(f"Using localhost URL: {base_url}")
-            logger.warning("IMPORTANT: Set MEDIA_BASE_URL in .env to your ngrok URL for WhatsApp to access files")
-        
-        media_url = f"{base_url}/uploads/{unique_filename}"
-        
-        # Log the URL for debugging
-        logger.info(f"Generated media URL: {media_url}")
-        
-        logger.info(f"File uploaded successfully: {file_path}")
+        media_url, file_size = await _store_upload(file, settings)
         
         return {
             "filename": file.filename,
             "content_type": file.content_type,
             "media_url": media_url,
-            "file_size": len(content),
+            "file_size": file_size,
             "message": "File uploaded successfully to local storage.",
             "test_url": f"{media_url}?test=1"  # Add test parameter to verify accessibility
         }
@@ -179,12 +278,52 @@ async def upload_media(file: UploadFile = File(...)):
         logger.error(f"Error uploading media: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/send-file", response_model=SendMessageResponse)
+async def send_file_message(
+    to: str = Form(..., description="WhatsApp phone number (with country code, no +)"),
+    media_type: str = Form(..., description="Media type: audio, document, image, video"),
+    file: UploadFile = File(..., description="Media file to upload and send"),
+    caption: Optional[str] = Form(None, description="Caption for the media"),
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service),
+    settings: Settings = Depends(get_settings)
+):
+    """Upload a media file and send it via WhatsApp in a single request."""
+    if media_type not in ["audio", "document", "image", "video"]:
+        raise HTTPException(status_code=400, detail="Invalid media type")
+    
+    try:
+        media_url, _ = await _store_upload(file, settings)
+        
+        response = await whatsapp_service.send_media_message(
+            to=to,
+            media_type=media_type,
+            media_url=media_url,
+            caption=caption
+        )
+        return response
+    except Exception as e:
+        logger.error(f"Error sending file message: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 def add_received_message(message: ReceivedMessage):
     """Add a received message to storage."""
+    global _messages_version
+    if received_messages and len(received_messages) == received_messages.maxlen:
+        # The deque drops its oldest message on append; remove it from the index too
+        evicted = received_messages[0]
+        if _message_index.get(evicted.message_id) is evicted:
+            del _message_index[evicted.message_id]
     received_messages.append(message)
+    _message_index[message.message_id] = message
+    _messages_version += 1
+    for queue in _subscribers:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Message stream client is not keeping up; skipping message")
     # In production, save to database
     logger.info(f"Added received message: {message.message_id}")
 
-def get_received_messages() -> List[ReceivedMessage]:
+def get_received_messages() -> Deque[ReceivedMessage]:
     """Get all received messages."""
     return received_messages
\ No newline at end of file
@@ -1,69 +1,86 @@
-from fastapi import APIRouter, HTTPException, Request, Query
-from fastapi.responses import PlainTextResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import PlainTextResponse, Response
 import logging
-import json
+import msgspec
+import orjson
 
-from ..config import settings
-from ..services.whatsapp import whatsapp_service
+from ..config import Settings, get_settings
+from ..models.message import WebhookData
+from ..services.whatsapp import WhatsAppService, get_whatsapp_service
 from .messages import add_received_message
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhook", tags=["webhooks"])
 
+# Acknowledgement body for webhook deliveries, serialized once
+_OK_BODY = orjson.dumps({"status": "ok"})
+
 @router.get("/")
 async def verify_webhook(
     hub_mode: str = Query(..., alias="hub.mode"),
     hub_challenge: str = Query(..., alias="hub.challenge"),
-    hub_verify_token: str = Query(..., alias="hub.verify_token")
+    hub_verify_token: str = Query(..., alias="hub.verify_token"),
+    settings: Settings = Depends(get_settings)
 ):
     """Verify webhook endpoint for WhatsApp."""
     try:
         # Verify the webhook
-        if hub_mode == "subscribe" and hub_verify_token == settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN:
+        if hub_mode == "subscribe" and settings.check_webhook_verify_token(hub_verify_token):
             logger.info("Webhook verified successfully")
             return PlainTextResponse(content=hub_challenge)
         else:
             logger.error("Webhook verification failed")
             raise HTTPException(status_code=403, detail="Forbidden")
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error verifying webhook: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/")
-async def receive_webhook(request: Request):
+async def receive_webhook(
+    request: Request,
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
+):
     """Receive webhook notifications from WhatsApp."""
     try:
         # Get the raw body
         body = await request.body()
-        data = json.loads(body.decode('utf-8'))
+        data = msgspec.json.decode(body, type=WebhookData)
         
-        logger.info(f"Received webhook: {json.dumps(data, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received webhook: %s", body.decode("utf-8", "replace"))
         
         # Parse the webhook data
         message = whatsapp_service.parse_webhook_message(data)
         
         if message:
-            # Add to received messages storage
-            add_received_message(message)
-            logger.info(f"Processed message: {message.message_id} from {message.from_number}")
-            
             # Handle different message types
             if message.message_type.value == "text":
                 logger.info(f"Text message: {message.text}")
             elif message.message_type.value in ["audio", "document", "image", "video"]:
                 logger.info(f"Media message: {message.message_type.value}")
                 if message.media_id:
-                    # Download media if needed
+                    # Download media before storing the message, so list ETags and
+                    # stream subscribers never see it without its local URL
                     media_url = await whatsapp_service.download_media(message.media_id)
                     if media_url:
+                        message.media_url = media_url
                         logger.info(f"Downloaded media: {media_url}")
+            
+            # Add to received messages storage
+            add_received_message(message)
+            logger.info(f"Processed message: {message.message_id} from {message.from_number}")
         else:
             logger.info("No message data found in webhook")
         
-        return {"status": "ok"}
+        return Response(content=_OK_BODY, media_type="application/json")
         
-    except json.JSONDecodeError as e:
+    except msgspec.ValidationError as e:
+        logger.error(f"Invalid webhook payload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    except msgspec.DecodeError as e:
         logger.error(f"Invalid JSON in webhook: {e}")
         raise HTTPException(status_code=400, detail="Invalid JSON")
     except Exception as e:
@@ -71,7 +88,7 @@ async def receive_webhook(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status")
-async def webhook_status():
+async def webhook_status(settings: Settings = Depends(get_settings)):
     """Get webhook status and configuration."""
     try:
         return {
@@ -1,27 +1,92 @@
 import httpx
-import json
+import orjson
 import logging
+import mimetypes
+import time
+import uuid
+import aiofiles
+from collections import OrderedDict
+from async_lru import alru_cache
+from fastapi import Request
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from ..config import settings
-from ..models.message import MessageType, MessageStatus, SendMessageRequest, SendMessageResponse, ReceivedMessage
+from ..config import MEDIA_CHUNK_SIZE, UPLOAD_DIR, Settings, get_settings
+from ..models.message import MessageType, MessageStatus, SendMessageRequest, SendMessageResponse, ReceivedMessage, WebhookData
 
 logger = logging.getLogger(__name__)
 
+# Lookup tables for webhook parsing
+_MSG_TYPE_MAP = {m.value: m for m in MessageType}
+_MEDIA_TYPES = frozenset({"audio", "document", "image", "video"})
+# Media types that accept a caption when sending
+_CAPTION_MEDIA_TYPES = frozenset({"document", "image", "video"})
+
+# WhatsApp media download URLs expire after five minutes, so cached media info must expire sooner
+MEDIA_INFO_CACHE_TTL = 240
+
+def create_http_client(settings: Settings) -> httpx.AsyncClient:
+    """Create the pooled HTTP client used for WhatsApp API requests."""
+    return httpx.AsyncClient(
+        base_url=settings.WHATSAPP_API_BASE_URL,
+        headers=settings.get_whatsapp_headers(),
+        http2=True,
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+
 class WhatsAppService:
     """Service for interacting with WhatsApp Business API."""
     
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        settings = get_settings()
         self.base_url = settings.WHATSAPP_API_BASE_URL
         self.phone_number_id = settings.WHATSAPP_PHONE_NUMBER_ID
         self.access_token = settings.WHATSAPP_ACCESS_TOKEN
         self.headers = settings.get_whatsapp_headers()
+        # Messages endpoint, relative to the client's base URL
+        self._send_url = f"/{self.phone_number_id}/messages"
+        # Shared HTTP client; created lazily if not provided so the service can be
+        # instantiated without a running event loop
+        self._client = client
+        # Local URLs of media already downloaded, keyed by WhatsApp media ID. Bounded like
+        # the message store; the least recently used entries are evicted first.
+        self._downloaded_media: "OrderedDict[str, str]" = OrderedDict()
+        self._downloaded_media_max = settings.MAX_RECEIVED_MESSAGES
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP client, creating it on first use."""
+        if self._client is None:
+            self._client = create_http_client(get_settings())
+        return self._client
+    
+    async def close(self):
+        """Close the shared HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        
+    async def _post_message(self, payload: Dict[str, Any]) -> SendMessageResponse:
+        """Post a message payload to the WhatsApp messages endpoint."""
+        client = await self._get_client()
+        response = await client.post(self._send_url, content=orjson.dumps(payload))
+        raw = await response.aread()
+        if response.status_code >= 400:
+            raise httpx.HTTPStatusError(
+                f"WhatsApp API returned HTTP {response.status_code}",
+                request=response.request,
+                response=response
+            )
         
+        # Fields are produced locally, so skip Pydantic validation
+        return SendMessageResponse.model_construct(
+            message_id=orjson.loads(raw)["messages"][0]["id"],
+            status=MessageStatus.SENT,
+            timestamp=datetime.now()
+        )
+    
     async def send_text_message(self, to: str, text: str) -> SendMessageResponse:
         """Send a text message via WhatsApp."""
-        url = f"{self.base_url}/{self.phone_number_id}/messages"
-        
         payload = {
             "messaging_product": "whatsapp",
             "to": to,
@@ -32,24 +97,8 @@ class WhatsAppService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                message_id = data["messages"][0]["id"]
-                
-                return SendMessageResponse(
-                    message_id=message_id,
-                    status=MessageStatus.SENT,
-                    timestamp=datetime.now()
-                )
-                
+            return await self._post_message(payload)
+            
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error sending text message: {e}")
             raise Exception(f"Failed to send message: {e.response.text}")
@@ -59,8 +108,6 @@ class WhatsAppService:
     
     async def send_media_message(self, to: str, media_type: str, media_url: str, caption: Optional[str] = None) -> SendMessageResponse:
         """Send a media message (audio, document, image, video) via WhatsApp."""
-        url = f"{self.base_url}/{self.phone_number_id}/messages"
-        
         payload = {
             "messaging_product": "whatsapp",
             "to": to,
@@ -71,28 +118,12 @@ class WhatsAppService:
         }
         
         # Add caption if provided
-        if caption and media_type in ["document", "image", "video"]:
+        if caption and media_type in _CAPTION_MEDIA_TYPES:
             payload[media_type]["caption"] = caption
             
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                message_id = data["messages"][0]["id"]
-                
-                return SendMessageResponse(
-                    message_id=message_id,
-                    status=MessageStatus.SENT,
-                    timestamp=datetime.now()
-                )
-                
+            return await self._post_message(payload)
+            
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error sending media message: {e}")
             raise Exception(f"Failed to send media message: {e.response.text}")
@@ -100,116 +131,105 @@ class WhatsAppService:
             logger.error(f"Error sending media message: {e}")
             raise Exception(f"Failed to send media message: {str(e)}")
     
+    @alru_cache(maxsize=1024, ttl=MEDIA_INFO_CACHE_TTL)
+    async def _media_info(self, media_id: str) -> Dict[str, Any]:
+        """Fetch media metadata (cached, so repeated webhook deliveries skip the lookup)."""
+        client = await self._get_client()
+        response = await client.get(f"/{media_id}")
+        response.raise_for_status()
+        
+        return orjson.loads(response.content)
+    
     async def download_media(self, media_id: str) -> Optional[str]:
-        """Download media file from WhatsApp."""
+        """Download media file from WhatsApp to local storage and return its URL."""
+        local_url = self._downloaded_media.get(media_id)
+        if local_url:
+            self._downloaded_media.move_to_end(media_id)
+            return local_url
+        
+        file_path = None
         try:
-            # First, get media URL
-            media_url = f"{self.base_url}/{media_id}"
+            media_data = await self._media_info(media_id)
+            download_url = media_data["url"]
+            
+            mime_type = media_data.get("mime_type", "").split(";")[0].strip()
+            file_extension = mimetypes.guess_extension(mime_type) or ""
+            filename = f"{uuid.uuid4().hex}{file_extension}"
+            file_path = UPLOAD_DIR / filename
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    media_url,
-                    headers=self.headers,
-                    timeout=30.0
-                )
+            # Stream the actual media file to disk
+            client = await self._get_client()
+            async with client.stream("GET", download_url, timeout=60.0) as response:
                 response.raise_for_status()
-                
-                media_data = response.json()
-                download_url = media_data["url"]
-                
-                # Download the actual media file
-                download_response = await client.get(
-                    download_url,
-                    headers=self.headers,
-                    timeout=60.0
-                )
-                download_response.raise_for_status()
-                
-                # Save media file (you might want to save to a specific directory)
-                # For now, return the URL
-                return download_url
+                async with aiofiles.open(file_path, "wb") as buffer:
+                    async for chunk in response.aiter_bytes(MEDIA_CHUNK_SIZE):
+                        await buffer.write(chunk)
+            
+            local_url = f"{get_settings().get_media_base_url()}/uploads/{filename}"
+            self._downloaded_media[media_id] = local_url
+            if len(self._downloaded_media) > self._downloaded_media_max:
+                self._downloaded_media.popitem(last=False)
+            return local_url
                 
         except Exception as e:
             logger.error(f"Error downloading media {media_id}: {e}")
+            if file_path is not None:
+                file_path.unlink(missing_ok=True)
             return None
     
     async def get_media_info(self, media_id: str) -> Optional[Dict[str, Any]]:
         """Get information about a media file."""
         try:
-            url = f"{self.base_url}/{media_id}"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                
-                return response.json()
+            # Copy so callers cannot modify the cached value
+            return dict(await self._media_info(media_id))
                 
         except Exception as e:
             logger.error(f"Error getting media info for {media_id}: {e}")
             return None
     
-    def parse_webhook_message(self, webhook_data: Dict[str, Any]) -> Optional[ReceivedMessage]:
+    def parse_webhook_message(self, webhook_data: WebhookData) -> Optional[ReceivedMessage]:
         """Parse incoming webhook message."""
         try:
-            entry = webhook_data.get("entry", [])
-            if not entry:
-                return None
-                
-            changes = entry[0].get("changes", [])
-            if not changes:
-                return None
-                
-            value = changes[0].get("value", {})
-            messages = value.get("messages", [])
-            
-            if not messages:
-                return None
-                
-            message = messages[0]
-            
-            # Extract message details
-            message_id = message.get("id", "")
-            from_number = message.get("from", "")
-            timestamp = message.get("timestamp", "")
-            message_type = message.get("type", "text")
-            
-            # Parse timestamp
-            try:
-                dt = datetime.fromtimestamp(int(timestamp))
-            except:
-                dt = datetime.now()
-            
-            # Extract content based on message type
-            text_content = None
-            media_url = None
-            media_id = None
-            
-            if message_type == "text":
-                text_content = message.get("text", {}).get("body", "")
-            elif message_type in ["audio", "document", "image", "video"]:
-                media_data = message.get(message_type, {})
-                media_id = media_data.get("id", "")
-                media_url = media_data.get("link", "")
-                text_content = media_data.get("caption", "")
-            
-            return ReceivedMessage(
-                message_id=message_id,
-                from_number=from_number,
-                message_type=MessageType(message_type),
-                text=text_content,
-                media_url=media_url,
-                media_id=media_id,
-                timestamp=dt,
-                status=MessageStatus.DELIVERED
-            )
-            
-        except Exception as e:
-            logger.error(f"Error parsing webhook message: {e}")
+            message = webhook_data.entry[0].changes[0].value.messages[0]
+        except IndexError:
+            # Not a message notification (e.g. a status update)
             return None
+        
+        message_type = _MSG_TYPE_MAP.get(message.type)
+        if message_type is None:
+            logger.warning(f"Unsupported message type: {message.type}")
+            return None
+        
+        # Keep the epoch timestamp as sent by WhatsApp
+        timestamp = message.timestamp
+        timestamp = int(timestamp) if timestamp.isdigit() else int(time.time())
+        
+        # Extract content based on message type
+        text_content = None
+        media_url = None
+        media_id = None
+        
+        if message_type is MessageType.TEXT:
+            text_content = message.text.body if message.text else ""
+        elif message.type in _MEDIA_TYPES:
+            media_data = getattr(message, message.type)
+            if media_data:
+                media_id = media_data.id
+                media_url = media_data.link
+                text_content = media_data.caption
+        
+        # Fields are already typed above, so skip Pydantic validation
+        return ReceivedMessage.model_construct(
+            message_id=message.id,
+            from_number=message.from_,
+            message_type=message_type,
+            text=text_content,
+            media_url=media_url,
+            media_id=media_id,
+            timestamp=timestamp,
+            status=MessageStatus.DELIVERED
+        )
 
-# Global service instance
-whatsapp_service = WhatsAppService()
\ No newline at end of file
+def get_whatsapp_service(request: Request) -> WhatsAppService:
+    """Get the WhatsApp service created for the running application."""
+    return request.app.state.whatsapp
\ No newline at end of file
@@ -10,19 +10,24 @@ import sys
 import re
 from pathlib import Path
 
+import httpx
+
+NGROK_API_URL = "http://localhost:4040/api/tunnels"
+NGROK_URL_PATTERN = re.compile(r'https://[a-zA-Z0-9-]+\.ngrok(?:-free)?\.(?:io|app|dev)')
+MEDIA_BASE_URL_PATTERN = re.compile(r'^MEDIA_BASE_URL=.*$', re.MULTILINE)
+
 def get_ngrok_url():
     """Get the current ngrok URL."""
     try:
         # Try to get ngrok URL from ngrok API
-        import requests
-        response = requests.get("http://localhost:4040/api/tunnels", timeout=5)
+        response = httpx.get(NGROK_API_URL, timeout=2.0)
         if response.status_code == 200:
-            data = response.json()
-            tunnels = data.get("tunnels", [])
-            for tunnel in tunnels:
+            for tunnel in response.json().get("tunnels", []):
                 if tunnel.get("proto") == "https":
                     return tunnel.get("public_url")
-    except:
+            # ngrok is running but has no HTTPS tunnel; the CLI would not find one either
+            return None
+    except (httpx.HTTPError, ValueError):
         pass
     
     # Fallback: try to get from ngrok status
@@ -30,13 +35,10 @@ def get_ngrok_url():
         result = subprocess.run(["ngrok", "api", "tunnels"], capture_output=True, text=True, timeout=5)
         if result.returncode == 0:
             # Parse the output to find the HTTPS URL
-            lines = result.stdout.split('\n')
-            for line in lines:
-                if 'https://' in line and '.ngrok.io' in line:
-                    match = re.search(r'https://[a-zA-Z0-9-]+\.ngrok\.io', line)
-                    if match:
-                        return match.group(0)
-    except:
+            match = NGROK_URL_PATTERN.search(result.stdout)
+            if match:
+                return match.group(0)
+    except (OSError, subprocess.SubprocessError):
         pass
     
     return None
@@ -48,24 +50,17 @@ def update_env_file(ngrok_url):
         print("❌ .env file not found. Please create it from .env.example first.")
         return False
     
-    # Read current .env file
-    with open(env_file, 'r') as f:
-        lines = f.readlines()
-    
     # Update or add MEDIA_BASE_URL
-    updated = False
-    for i, line in enumerate(lines):
-        if line.startswith("MEDIA_BASE_URL="):
-            lines[i] = f"MEDIA_BASE_URL={ngrok_url}\n"
-            updated = True
-            break
+    content = env_file.read_text()
+    media_base_url = f"MEDIA_BASE_URL={ngrok_url}"
+    content, updated = MEDIA_BASE_URL_PATTERN.subn(lambda _: media_base_url, content)
     
     if not updated:
-        lines.append(f"MEDIA_BASE_URL={ngrok_url}\n")
+        if content and not content.endswith("\n"):
+            content += "\n"
+        content += f"{media_base_url}\n"
     
-    # Write back to file
-    with open(env_file, 'w') as f:
-        f.writelines(lines)
+    env_file.write_text(content)
     
     return True
 
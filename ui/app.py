@@ -1,8 +1,14 @@
 import streamlit as st
+import html
+import ijson
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,6 +16,16 @@ load_dotenv()
 
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# How long the Received Messages live tail stays open, in seconds
+LIVE_TAIL_SECONDS = 30
+
+# File extensions accepted by the uploader for each media message type
+_UPLOAD_EXT = {
+    "Audio": ("mp3", "wav", "ogg"),
+    "Document": ("pdf", "doc", "docx"),
+    "Image": ("jpg", "jpeg", "png", "gif"),
+    "Video": ("mp4", "avi", "mov"),
+}
 
 # Page configuration
 st.set_page_config(
@@ -19,8 +35,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS and page header, emitted together as one element at the top of main().
+# Streamlit drops any element that is not re-emitted on a rerun, so they are written every run.
+_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -52,24 +69,84 @@ st.markdown("""
         margin: 0.5rem 0;
         background-color: #f8f9fa;
     }
+    .message-status {
+        float: right;
+        padding: 0.125rem 0.5rem;
+        border-radius: 0.375rem;
+        font-size: 0.875rem;
+    }
+    .status-ok {
+        background-color: #d4edda;
+        color: #155724;
+    }
+    .status-info {
+        background-color: #d1ecf1;
+        color: #0c5460;
+    }
+    .status-unknown {
+        background-color: #fff3cd;
+        color: #856404;
+    }
 </style>
-""", unsafe_allow_html=True)
+"""
+_HEADER_HTML = '<h1 class="main-header">📱 WhatsApp Messaging Utility</h1>'
+_PAGE_HEAD = _CSS + _HEADER_HTML
+
+class _TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request."""
+    
+    def __init__(self, *args, timeout=(5, 30), **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+    
+    def send(self, request, **kwargs):
+        # requests passes timeout=None when the caller did not set one
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+@st.cache_resource
+def _http() -> requests.Session:
+    """Get the HTTP session shared across reruns, so connections to the backend are reused."""
+    session = requests.Session()
+    adapter = _TimeoutAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.2)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _get_health_cached():
+    """Fetch backend health; only successful responses are cached, so failures are retried."""
+    response = _http().get(f"{BACKEND_URL}/health")
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _get_config_cached():
+    """Fetch backend configuration; only successful responses are cached."""
+    response = _http().get(f"{BACKEND_URL}/config")
+    response.raise_for_status()
+    return response.json()
 
 def check_backend_connection():
     """Check if backend is running."""
     try:
-        response = requests.get(f"{BACKEND_URL}/health", timeout=5)
-        return response.status_code == 200
+        _get_health_cached()
+        return True
     except:
         return False
 
 def send_text_message(to, text):
     """Send a text message."""
     try:
-        response = requests.post(
+        response = _http().post(
             f"{BACKEND_URL}/api/messages/send-text",
-            data={"to": to, "text": text},
-            timeout=30
+            data={"to": to, "text": text}
         )
         return response.json(), response.status_code
     except Exception as e:
@@ -82,39 +159,157 @@ def send_media_message(to, media_type, media_url, caption=None):
         if caption:
             data["caption"] = caption
         
-        response = requests.post(
+        response = _http().post(
             f"{BACKEND_URL}/api/messages/send-media",
-            data=data,
-            timeout=30
+            data=data
         )
         return response.json(), response.status_code
     except Exception as e:
         return {"error": str(e)}, 500
 
+@st.cache_resource
+def _etag_cache():
+    """Last (ETag, body) per URL, shared across reruns so unchanged data is not re-sent."""
+    return {}
+
 def get_messages():
     """Get received messages."""
+    url = f"{BACKEND_URL}/api/messages/"
+    cached = _etag_cache().get(url)
+    headers = {"If-None-Match": cached[0]} if cached else None
     try:
-        response = requests.get(f"{BACKEND_URL}/api/messages/", timeout=10)
-        return response.json(), response.status_code
+        with _http().get(url, stream=True, headers=headers) as response:
+            if response.status_code == 304:
+                return cached[1], 200
+            # Parse the body as it arrives instead of buffering it for response.json()
+            response.raw.decode_content = True
+            data = dict(ijson.kvitems(response.raw, "", use_float=True))
+            if response.status_code == 200 and "ETag" in response.headers:
+                _etag_cache()[url] = (response.headers["ETag"], data)
+            return data, response.status_code
     except Exception as e:
         return {"error": str(e)}, 500
 
+@st.cache_data(ttl=5, show_spinner=False)
+def _fetch_messages(nonce):
+    """Get received messages, reused across reruns until the TTL expires or the nonce changes."""
+    return get_messages()
+
+def tail_messages(seconds=LIVE_TAIL_SECONDS):
+    """Yield new messages from the backend's message stream as markdown lines, for about `seconds`."""
+    deadline = time.monotonic() + seconds
+    try:
+        # The backend pings every 15 seconds, so the deadline is checked at least that often
+        with _http().get(f"{BACKEND_URL}/api/messages/stream", stream=True, timeout=(5, seconds)) as response:
+            for line in response.iter_lines():
+                if line.startswith(b"data:"):
+                    message = orjson.loads(line[5:])
+                    timestamp = format_timestamp(message.get('timestamp'))
+                    content = message.get('text') or "Media message"
+                    yield f"- **{message.get('from_number', 'Unknown')}** ({timestamp}): {content}\n"
+                if time.monotonic() >= deadline:
+                    break
+    except requests.exceptions.RequestException:
+        # Read timeout after the deadline or a dropped connection ends the tail
+        pass
+
 def upload_media(file):
     """Upload a media file."""
     try:
-        files = {"file": file}
-        response = requests.post(
+        # Stream the multipart body instead of building it in memory
+        file.seek(0)
+        encoder = MultipartEncoder(
+            fields={"file": (file.name, file, file.type or "application/octet-stream")}
+        )
+        response = _http().post(
             f"{BACKEND_URL}/api/messages/media/upload",
-            files=files,
-            timeout=30
+            data=encoder,
+            headers={"Content-Type": encoder.content_type}
         )
         return response.json(), response.status_code
     except Exception as e:
         return {"error": str(e)}, 500
 
+def send_file_message(to, media_type, file, caption=None):
+    """Upload a media file and send it in one request."""
+    try:
+        fields = {"to": to, "media_type": media_type}
+        if caption:
+            fields["caption"] = caption
+        file.seek(0)
+        fields["file"] = (file.name, file, file.type or "application/octet-stream")
+        encoder = MultipartEncoder(fields=fields)
+        response = _http().post(
+            f"{BACKEND_URL}/api/messages/send-file",
+            data=encoder,
+            headers={"Content-Type": encoder.content_type}
+        )
+        if response.status_code in (404, 405):
+            # Older backend without the combined endpoint: upload first, then send
+            upload_result, upload_status = upload_media(file)
+            if upload_status != 200:
+                return upload_result, upload_status
+            return send_media_message(to, media_type, upload_result.get("media_url"), caption)
+        return response.json(), response.status_code
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def format_timestamp(timestamp):
+    """Format a Unix epoch timestamp for display."""
+    if isinstance(timestamp, int):
+        return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    return timestamp
+
+# Metric label for whether a configuration value is set
+_SET_LABELS = {True: "✅ Set", False: "❌ Not Set"}
+
+# Badge label and CSS class for each message status
+_STATUS_BADGES = {
+    "delivered": ("✅ Delivered", "status-ok"),
+    "sent": ("📤 Sent", "status-info"),
+    "read": ("👁️ Read", "status-ok"),
+}
+
+_MESSAGE_CARD = (
+    '<div class="message-card">'
+    '<span class="message-status {status_class}">{status_label}</span>'
+    '<b>📱 Message {number} from {from_number}</b><br>'
+    '<b>📅 Time:</b> {timestamp}<br>'
+    '<b>📝 Type:</b> {message_type}<br>'
+    '<b>💬 Content:</b> {content}'
+    '{media}'
+    '</div>'
+)
+
+def _escape(value):
+    """Escape a value for the message list HTML, keeping line breaks."""
+    return html.escape(str(value)).replace("\n", "<br>")
+
+def render_message_card(number, message):
+    """Build the HTML card for one received message."""
+    status = message.get('status', 'Unknown')
+    status_label, status_class = _STATUS_BADGES.get(status, (f"❓ {status}", "status-unknown"))
+    
+    media = ""
+    if message.get('media_url'):
+        media += f"<br><b>🔗 Media URL:</b> {_escape(message['media_url'])}"
+    if message.get('media_id'):
+        media += f"<br><b>🆔 Media ID:</b> {_escape(message['media_id'])}"
+    
+    return _MESSAGE_CARD.format(
+        status_class=status_class,
+        status_label=_escape(status_label),
+        number=number,
+        from_number=_escape(message.get('from_number', 'Unknown')),
+        timestamp=_escape(format_timestamp(message.get('timestamp', 'Unknown'))),
+        message_type=_escape(message.get('message_type', 'Unknown')),
+        content=_escape(message.get('text') or "Media message"),
+        media=media
+    )
+
 def main():
     # Header
-    st.markdown('<h1 class="main-header">📱 WhatsApp Messaging Utility</h1>', unsafe_allow_html=True)
+    st.markdown(_PAGE_HEAD, unsafe_allow_html=True)
     
     # Sidebar
     with st.sidebar:
@@ -176,8 +371,9 @@ def main():
                 # Media upload
                 uploaded_file = st.file_uploader(
                     f"Upload {message_type}",
-                    type=["mp3", "wav", "ogg", "pdf", "doc", "docx", "jpg", "jpeg", "png", "gif", "mp4", "avi", "mov"],
-                    help=f"Upload a {message_type.lower()} file"
+                    type=list(_UPLOAD_EXT[message_type]),
+                    help=f"Upload a {message_type.lower()} file",
+                    key=f"up_{message_type}"
                 )
                 
                 caption = st.text_area(
@@ -200,19 +396,12 @@ def main():
                         if message_type == "Text":
                             result, status_code = send_text_message(phone_number, message_text)
                         else:
-                            # Upload file first
-                            upload_result, upload_status = upload_media(uploaded_file)
-                            if upload_status == 200:
-                                media_url = upload_result.get("media_url")
-                                result, status_code = send_media_message(
-                                    phone_number, 
-                                    message_type.lower(), 
-                                    media_url, 
-                                    caption if caption else None
-                                )
-                            else:
-                                result = upload_result
-                                status_code = upload_status
+                            result, status_code = send_file_message(
+                                phone_number,
+                                message_type.lower(),
+                                uploaded_file,
+                                caption if caption else None
+                            )
                         
                         if status_code == 200:
                             st.success("✅ Message sent successfully!")
@@ -225,13 +414,22 @@ def main():
         
         col1, col2 = st.columns([3, 1])
         
+        # Bumping the nonce makes the next fetch bypass the cached result
+        st.session_state.setdefault("msg_nonce", 0)
         with col2:
             if st.button("🔄 Refresh Messages"):
-                st.rerun()
+                st.session_state["msg_nonce"] += 1
+            live_tail = st.button(f"📡 Live Tail ({LIVE_TAIL_SECONDS}s)")
+        
+        if live_tail:
+            st.caption("Waiting for new messages...")
+            st.write_stream(tail_messages())
+            # Include the new messages in the list below
+            st.session_state["msg_nonce"] += 1
         
         # Get and display messages
         with st.spinner("Loading messages..."):
-            messages_data, status_code = get_messages()
+            messages_data, status_code = _fetch_messages(st.session_state["msg_nonce"])
             
             if status_code == 200:
                 messages = messages_data.get("messages", [])
@@ -244,34 +442,51 @@ def main():
                     st.json(messages_data)
                 
                 if messages:
-                    for i, message in enumerate(messages):
-                        # Create expandable message cards
+                    # Render the whole list as one element instead of a widget tree per message
+                    parts = []
+                    for i, message in enumerate(messages, 1):
+                        try:
+                            parts.append(render_message_card(i, message))
+                        except Exception as e:
+                            parts.append(f'<div class="error-message">Error displaying message {i}: {_escape(e)}</div>')
+                    st.markdown("".join(parts), unsafe_allow_html=True)
+                    
+                    # Full details only for the message the user picks
+                    selected = st.selectbox(
+                        "🔍 Message details",
+                        options=range(len(messages)),
+                        index=None,
+                        format_func=lambda i: f"Message {i+1} from {messages[i].get('from_number', 'Unknown')} ({messages[i].get('message_id', '')})",
+                        placeholder="Select a message"
+                    )
+                    if selected is not None:
+                        message = messages[selected]
                         try:
                             from_number = message.get('from_number', 'Unknown')
-                            timestamp = message.get('timestamp', 'Unknown')
+                            timestamp = format_timestamp(message.get('timestamp', 'Unknown'))
                             message_type = message.get('message_type', 'Unknown')
                             text_content = message.get('text', '')
                             
-                            with st.expander(f"📱 Message {i+1} from {from_number}", expanded=True):
+                            with st.expander(f"📱 Message {selected+1} from {from_number}", expanded=True):
                                 col1, col2 = st.columns([2, 1])
                                 
                                 with col1:
-                                    st.write(f"**📱 From:** {from_number}")
-                                    st.write(f"**📅 Time:** {timestamp}")
-                                    st.write(f"**📝 Type:** {message_type}")
-                                    
-                                    # Display message content
-                                    if text_content:
-                                        st.write(f"**💬 Content:** {text_content}")
-                                    else:
-                                        st.write("**💬 Content:** Media message")
+                                    # One markdown block (trailing double spaces are line breaks)
+                                    details = [
+                                        f"**📱 From:** {from_number}",
+                                        f"**📅 Time:** {timestamp}",
+                                        f"**📝 Type:** {message_type}",
+                                        f"**💬 Content:** {text_content}" if text_content else "**💬 Content:** Media message"
+                                    ]
                                     
                                     # Display media information
                                     if message.get('media_url'):
-                                        st.write(f"**🔗 Media URL:** {message.get('media_url')}")
+                                        details.append(f"**🔗 Media URL:** {message.get('media_url')}")
                                     
                                     if message.get('media_id'):
-                                        st.write(f"**🆔 Media ID:** {message.get('media_id')}")
+                                        details.append(f"**🆔 Media ID:** {message.get('media_id')}")
+                                    
+                                    st.markdown("  \n".join(details))
                                 
                                 with col2:
                                     # Message status
@@ -284,10 +499,8 @@ def main():
                                         st.success("👁️ Read")
                                     else:
                                         st.warning(f"❓ {status}")
-                                
-                                st.markdown("---")
                         except Exception as e:
-                            st.error(f"Error displaying message {i+1}: {e}")
+                            st.error(f"Error displaying message {selected+1}: {e}")
                             st.json(message)
                 else:
                     st.info("📭 No messages received yet")
@@ -301,36 +514,30 @@ def main():
         
         # Display current configuration
         try:
-            config_response = requests.get(f"{BACKEND_URL}/config", timeout=5)
-            if config_response.status_code == 200:
-                config = config_response.json()
-                
+            config = _get_config_cached()
+            if config:
                 st.json(config)
                 
                 # Configuration status
                 st.subheader("📊 Configuration Status")
                 
+                phone_number_id_set = bool(config.get("phone_number_id_set"))
+                access_token_set = bool(config.get("access_token_set"))
+                webhook_token_set = bool(config.get("webhook_verify_token_set"))
+                all_ok = phone_number_id_set and access_token_set and webhook_token_set
+                
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric(
-                        "Phone Number ID",
-                        "✅ Set" if config.get("phone_number_id_set") else "❌ Not Set"
-                    )
+                    st.metric("Phone Number ID", _SET_LABELS[phone_number_id_set])
                 
                 with col2:
-                    st.metric(
-                        "Access Token",
-                        "✅ Set" if config.get("access_token_set") else "❌ Not Set"
-                    )
+                    st.metric("Access Token", _SET_LABELS[access_token_set])
                 
                 with col3:
-                    st.metric(
-                        "Webhook Token",
-                        "✅ Set" if config.get("webhook_verify_token_set") else "❌ Not Set"
-                    )
+                    st.metric("Webhook Token", _SET_LABELS[webhook_token_set])
                 
-                if not all([config.get("phone_number_id_set"), config.get("access_token_set"), config.get("webhook_verify_token_set")]):
+                if not all_ok:
                     st.warning("⚠️ Some configuration is missing. Please check your .env file.")
             else:
                 st.error("❌ Could not retrieve configuration")
@@ -21,37 +21,226 @@ Usage:
     
     # Get received messages
     messages = client.get_messages(limit=10)
+    
+    # Send many messages concurrently
+    async with AsyncWhatsAppClient("http://localhost:8000") as client:
+        results = await client.send_many([("1234567890", "Hello!"), ("1234567891", "Hi!")])
 """
 
+import argparse
+import asyncio
+import httpx
+import ijson
 import requests
-import json
-from typing import Optional, List, Dict, Any
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
+import mimetypes
+import orjson
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Tuple
 from pathlib import Path
 
+# Default (connect, read) timeout in seconds for requests made by WhatsAppClient
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests made without one."""
+    
+    def __init__(self, *args, timeout: Tuple[float, float] = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+    
+    def send(self, request, **kwargs):
+        # requests.Session always passes timeout, as None when the caller gave none
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _error_result(e: Exception) -> Dict[str, Any]:
+    """Build the error dict returned for a failed request (requests or httpx)."""
+    response = getattr(e, "response", None)
+    return {"error": str(e), "status_code": getattr(response, "status_code", None)}
+
+
+def _iter_json(chunks: Iterable[bytes], coro_factory: Callable, prefix: str) -> Iterator[Any]:
+    """Incrementally parse a JSON body from byte chunks with an ijson push coroutine."""
+    events = ijson.sendable_list()
+    coro = coro_factory(events, prefix, use_float=True)
+    for chunk in chunks:
+        coro.send(chunk)
+        yield from events
+        del events[:]
+    coro.close()
+    yield from events
+
 
 class WhatsAppClient:
     """Python client for WhatsApp Messaging Utility API."""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
+    def __init__(self, base_url: str = "http://localhost:8000", cache_ttl: float = 30.0, transport: str = "httpx"):
         """
         Initialize the WhatsApp client.
         
         Args:
             base_url: Base URL of the WhatsApp API server
+            cache_ttl: Seconds to reuse health and config responses (0 disables caching)
+            transport: "httpx" (default, HTTP/2 capable) or "requests"
         """
+        if transport not in ("httpx", "requests"):
+            raise ValueError(f"Unsupported transport: {transport}")
+        
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
-    
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        """Make HTTP request and handle errors."""
-        url = f"{self.base_url}{endpoint}"
+        self.cache_ttl = cache_ttl
+        self.transport = transport
+        
+        # Fixed endpoint URLs, built once
+        self._url_send_text = f"{self.base_url}/api/messages/send-text"
+        self._url_send_media = f"{self.base_url}/api/messages/send-media"
+        self._url_upload = f"{self.base_url}/api/messages/media/upload"
+        self._url_send_file = f"{self.base_url}/api/messages/send-file"
+        self._url_messages = f"{self.base_url}/api/messages/"
+        self._url_health = f"{self.base_url}/health"
+        self._url_config = f"{self.base_url}/config"
+        
+        # Successful GET responses for rarely-changing endpoints: {key: (expires_at, response)}
+        self._ttl_cache: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+        # ETag and body of the last GET response per (url, params), for conditional requests
+        self._etag: Dict[Tuple, str] = {}
+        self._cached: Dict[Tuple, Dict[str, Any]] = {}
+        
+        self._session: Optional[requests.Session] = None
+        self._hx: Optional[httpx.Client] = None
+        
+        if transport == "httpx":
+            # One client for all calls; over HTTPS, HTTP/2 multiplexes concurrent requests
+            # on a single connection. Connection failures are retried.
+            self._hx = httpx.Client(
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                    retries=3
+                ),
+                timeout=httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0]),
+                headers={"Accept": "application/json"}
+            )
+        else:
+            self._session = requests.Session()
+            # Larger connection pool, a default timeout, and retries with backoff for transient gateway errors.
+            # Status retries are limited to GET so a send is never repeated after the server
+            # may already have processed it; connection errors are retried for all methods.
+            retry = Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(["GET"])
+            )
+            adapter = TimeoutAdapter(pool_connections=50, pool_maxsize=50, max_retries=retry)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+            self._session.headers.update({"Accept": "application/json", "Connection": "keep-alive"})
+    
+    @property
+    def session(self) -> requests.Session:
+        """The underlying requests.Session (only with transport="requests")."""
+        if self._session is None:
+            raise AttributeError(
+                'WhatsAppClient.session is only available with transport="requests"; '
+                'this client uses httpx. Pass transport="requests" to customize the session.'
+            )
+        return self._session
+    
+    def __enter__(self) -> "WhatsAppClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close the underlying HTTP connections."""
+        if self._hx is not None:
+            self._hx.close()
+        else:
+            self._session.close()
+    
+    @staticmethod
+    def _cache_key(url: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+        return (url, tuple(sorted((params or {}).items())))
+    
+    def _conditional_headers(self, key: Tuple, headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+        """Add If-None-Match for a GET whose previous response carried an ETag."""
+        etag = self._etag.get(key)
+        if etag is None:
+            return headers
+        return {**(headers or {}), "If-None-Match": etag}
+    
+    def _remember(self, key: Tuple, response: Any, result: Dict[str, Any]) -> None:
+        """Keep a GET response body for reuse when the server later answers 304."""
+        etag = response.headers.get("ETag")
+        if etag:
+            self._etag[key] = etag
+            self._cached[key] = result
+    
+    def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """Make HTTP request to a full URL and handle errors."""
+        key = None
+        if method == "GET":
+            key = self._cache_key(url, kwargs.get("params"))
+            kwargs["headers"] = self._conditional_headers(key, kwargs.get("headers"))
         
         try:
-            response = self.session.request(method, url, **kwargs)
+            if self._hx is not None:
+                response = self._hx.request(method, url, **kwargs)
+            else:
+                response = self._session.request(method, url, **kwargs)
+            # Checked before raise_for_status, which treats 304 as an error in httpx
+            if response.status_code == 304 and key in self._cached:
+                return self._cached[key]
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": str(e), "status_code": getattr(e.response, 'status_code', None)}
+            result = orjson.loads(response.content)
+            if key is not None:
+                self._remember(key, response, result)
+            return result
+        except (requests.exceptions.RequestException, httpx.HTTPError) as e:
+            return _error_result(e)
+        except orjson.JSONDecodeError:
+            return {"error": "invalid json", "body": response.text[:500]}
+    
+    def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Make HTTP request to an API path and handle errors."""
+        return self._request(method, f"{self.base_url}{endpoint}", **kwargs)
+    
+    def _post_multipart(self, url: str, fields: Dict[str, str], file: Tuple[str, Any, str]) -> Dict[str, Any]:
+        """POST form fields plus a (name, fileobj, content_type) file, streamed rather than buffered."""
+        if self._hx is not None:
+            # httpx reads file fields in chunks while sending
+            return self._request("POST", url, data=fields, files={"file": file})
+        
+        encoder = MultipartEncoder(fields={**fields, "file": file})
+        return self._request("POST", url, data=encoder, headers={'Content-Type': encoder.content_type})
+    
+    @contextmanager
+    def _stream_get(self, url: str, params: Dict[str, Any],
+                    headers: Optional[Dict[str, str]] = None) -> Iterator[Tuple[Any, Iterator[bytes]]]:
+        """
+        Open a streamed GET and yield the response and an iterator over its decoded body chunks.
+        
+        A 304 Not Modified response is yielded as is; other error statuses raise.
+        """
+        if self._hx is not None:
+            with self._hx.stream("GET", url, params=params, headers=headers) as response:
+                if response.status_code != 304:
+                    response.raise_for_status()
+                yield response, response.iter_bytes()
+        else:
+            with self._session.get(url, params=params, headers=headers, stream=True) as response:
+                if response.status_code != 304:
+                    response.raise_for_status()
+                yield response, response.iter_content(chunk_size=64 * 1024)
     
     def send_text(self, to: str, text: str) -> Dict[str, Any]:
         """
@@ -65,7 +254,7 @@ class WhatsAppClient:
             API response with message details
         """
         data = {"to": to, "text": text}
-        return self._make_request("POST", "/api/messages/send-text", data=data)
+        return self._request("POST", self._url_send_text, data=data)
     
     def send_media(self, to: str, media_type: str, media_url: str, caption: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -88,7 +277,7 @@ class WhatsAppClient:
         if caption:
             data["caption"] = caption
         
-        return self._make_request("POST", "/api/messages/send-media", data=data)
+        return self._request("POST", self._url_send_media, data=data)
     
     def send_image(self, to: str, image_url: str, caption: Optional[str] = None) -> Dict[str, Any]:
         """Send an image message."""
@@ -120,9 +309,11 @@ class WhatsAppClient:
         if not file_path.exists():
             return {"error": f"File not found: {file_path}"}
         
+        content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        
+        # Stream the multipart body from disk instead of building it in memory
         with open(file_path, 'rb') as f:
-            files = {'file': f}
-            return self._make_request("POST", "/api/messages/media/upload", files=files)
+            return self._post_multipart(self._url_upload, {}, (file_path.name, f, content_type))
     
     def upload_and_send_file(self, to: str, file_path: str, media_type: str, caption: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -137,7 +328,26 @@ class WhatsAppClient:
         Returns:
             API response with message details
         """
-        # First upload the file
+        file_path = Path(file_path)
+        if not file_path.exists():
+            return {"error": f"File not found: {file_path}"}
+        
+        content_type = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        fields = {"to": to, "media_type": media_type}
+        if caption:
+            fields["caption"] = caption
+        
+        # Upload and send in one round trip through the combined endpoint
+        with open(file_path, 'rb') as f:
+            result = self._post_multipart(self._url_send_file, fields, (file_path.name, f, content_type))
+        
+        # Servers without the combined endpoint: upload first, then send
+        if result.get("status_code") in (404, 405):
+            return self._upload_then_send(to, file_path, media_type, caption)
+        return result
+    
+    def _upload_then_send(self, to: str, file_path: Path, media_type: str, caption: Optional[str] = None) -> Dict[str, Any]:
+        """Upload a file, then send its URL as a media message (two requests)."""
         upload_result = self.upload_file(file_path)
         
         if "error" in upload_result:
@@ -162,7 +372,38 @@ class WhatsAppClient:
             API response with messages list
         """
         params = {"limit": limit, "offset": offset}
-        return self._make_request("GET", "/api/messages/", params=params)
+        key = self._cache_key(self._url_messages, params)
+        try:
+            with self._stream_get(self._url_messages, params, self._conditional_headers(key)) as (response, chunks):
+                # Unchanged since the last call: reuse the previous result without a body
+                if response.status_code == 304 and key in self._cached:
+                    return self._cached[key]
+                # Parse the body as it arrives instead of buffering it for response.json()
+                result = dict(_iter_json(chunks, ijson.kvitems_coro, ""))
+                self._remember(key, response, result)
+                return result
+        except (requests.exceptions.RequestException, httpx.HTTPError) as e:
+            return _error_result(e)
+        except ijson.JSONError:
+            return {"error": "invalid json"}
+    
+    def stream_messages(self, limit: int = 50, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Yield received messages one at a time as the response is parsed.
+        
+        Args:
+            limit: Number of messages to return
+            offset: Number of messages to skip
+            
+        Yields:
+            Message dicts, in the same order as get_messages
+            
+        Raises:
+            httpx.HTTPError or requests.exceptions.RequestException: If the request fails
+        """
+        params = {"limit": limit, "offset": offset}
+        with self._stream_get(self._url_messages, params) as (_, chunks):
+            yield from _iter_json(chunks, ijson.items_coro, "messages.item")
     
     def get_message(self, message_id: str) -> Dict[str, Any]:
         """
@@ -188,57 +429,191 @@ class WhatsAppClient:
         """
         return self._make_request("GET", f"/api/messages/media/test/{filename}")
     
+    def _cached_get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """GET a URL, reusing a successful response for up to ``cache_ttl`` seconds."""
+        key = self._cache_key(url, params)
+        now = time.monotonic()
+        cached = self._ttl_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        
+        result = self._request("GET", url, params=params)
+        # Errors are never cached so a recovering server is picked up on the next call
+        if self.cache_ttl > 0 and "error" not in result:
+            self._ttl_cache[key] = (now + self.cache_ttl, result)
+        return result
+    
+    def refresh_config(self) -> None:
+        """Drop cached health and config responses so the next calls hit the server."""
+        self._ttl_cache.clear()
+    
     def health_check(self) -> Dict[str, Any]:
         """
-        Check API health status.
+        Check API health status (cached for ``cache_ttl`` seconds).
         
         Returns:
             API response with health status
         """
-        return self._make_request("GET", "/health")
+        return self._cached_get(self._url_health)
     
     def get_config(self) -> Dict[str, Any]:
         """
-        Get API configuration status.
+        Get API configuration status (cached for ``cache_ttl`` seconds).
+        
+        Call ``refresh_config()`` after changing the server's .env to see new values.
         
         Returns:
             API response with configuration details
         """
-        return self._make_request("GET", "/config")
+        return self._cached_get(self._url_config)
+
+
+class AsyncWhatsAppClient:
+    """Async Python client for WhatsApp Messaging Utility API, for sending many messages concurrently."""
+    
+    def __init__(self, base_url: str = "http://localhost:8000", max_concurrency: int = 20):
+        """
+        Initialize the async WhatsApp client.
+        
+        Args:
+            base_url: Base URL of the WhatsApp API server
+            max_concurrency: Maximum number of requests in flight at once in send_many
+        """
+        self.base_url = base_url.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=30.0,
+            headers={"Accept": "application/json"}
+        )
+    
+    async def __aenter__(self) -> "AsyncWhatsAppClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connections."""
+        await self._client.aclose()
+    
+    async def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Make HTTP request and handle errors."""
+        try:
+            response = await self._client.request(method, endpoint, **kwargs)
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except httpx.HTTPError as e:
+            response = getattr(e, "response", None)
+            return {"error": str(e), "status_code": getattr(response, "status_code", None)}
+        except orjson.JSONDecodeError:
+            return {"error": "invalid json", "body": response.text[:500]}
+    
+    async def send_text(self, to: str, text: str) -> Dict[str, Any]:
+        """Send a text message. See WhatsAppClient.send_text."""
+        data = {"to": to, "text": text}
+        return await self._make_request("POST", "/api/messages/send-text", data=data)
+    
+    async def send_media(self, to: str, media_type: str, media_url: str, caption: Optional[str] = None) -> Dict[str, Any]:
+        """Send a media message. See WhatsAppClient.send_media."""
+        data = {
+            "to": to,
+            "media_type": media_type,
+            "media_url": media_url
+        }
+        if caption:
+            data["caption"] = caption
+        
+        return await self._make_request("POST", "/api/messages/send-media", data=data)
+    
+    async def get_messages(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Get received messages. See WhatsAppClient.get_messages."""
+        params = {"limit": limit, "offset": offset}
+        return await self._make_request("GET", "/api/messages/", params=params)
+    
+    async def iter_messages(self, since_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield received messages as they arrive, from the server's message stream.
+        
+        Runs until the caller stops iterating or the connection drops.
+        
+        Args:
+            since_id: Also yield stored messages received after this message ID
+            
+        Yields:
+            Message dicts, oldest first
+            
+        Raises:
+            httpx.HTTPError: If the request fails
+        """
+        params = {"since": since_id} if since_id else None
+        # The server pings every 15 seconds, so a long silence means the connection is dead
+        timeout = httpx.Timeout(30.0, read=60.0)
+        async with self._client.stream("GET", "/api/messages/stream", params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    yield orjson.loads(line[5:])
+    
+    async def send_many(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Send many text messages concurrently.
+        
+        Args:
+            messages: List of (phone number, text) pairs
+            
+        Returns:
+            API responses, in the same order as the messages
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def send(to: str, text: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.send_text(to, text)
+        
+        return await asyncio.gather(*(send(to, text) for to, text in messages))
 
 
 # Example usage and testing
+def _show(data: Dict[str, Any]) -> None:
+    print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
+
+
+def _demo(client: WhatsAppClient, send_to: Optional[str] = None) -> None:
+    """Run the read-only API probes concurrently, plus test sends if a recipient is given."""
+    probes = [
+        ("Health Check", client.health_check),
+        ("Configuration", client.get_config),
+        ("Get Messages", lambda: client.get_messages(limit=5)),
+    ]
+    if send_to:
+        probes += [
+            ("Send Text Message", lambda: client.send_text(send_to, "Hello from Python SDK!")),
+            ("Send Image", lambda: client.send_image(send_to, "https://picsum.photos/400/300", "Random image!")),
+        ]
+    
+    # The probes are independent, so the demo takes about one round trip instead of one per call
+    with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+        futures = {executor.submit(fn): name for name, fn in probes}
+        for future in as_completed(futures):
+            print(f"\n{futures[future]}:")
+            _show(future.result())
+
+
 if __name__ == "__main__":
-    # Initialize client
-    client = WhatsAppClient("http://localhost:8000")
+    parser = argparse.ArgumentParser(description="WhatsApp API client test")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="WhatsApp API server URL")
+    parser.add_argument("--send-test-text", action="store_true",
+                        help="Also send a test text and image message (real WhatsApp sends)")
+    parser.add_argument("--to", default="1234567890", help="Recipient for --send-test-text")
+    args = parser.parse_args()
     
     print("🔧 WhatsApp API Client Test")
     print("=" * 40)
     
-    # Test health check
-    print("\n1. Health Check:")
-    health = client.health_check()
-    print(json.dumps(health, indent=2))
-    
-    # Test configuration
-    print("\n2. Configuration:")
-    config = client.get_config()
-    print(json.dumps(config, indent=2))
-    
-    # Test sending text message
-    print("\n3. Send Text Message:")
-    text_result = client.send_text("1234567890", "Hello from Python SDK!")
-    print(json.dumps(text_result, indent=2))
-    
-    # Test sending image
-    print("\n4. Send Image:")
-    image_result = client.send_image("1234567890", "https://picsum.photos/400/300", "Random image!")
-    print(json.dumps(image_result, indent=2))
-    
-    # Test getting messages
-    print("\n5. Get Messages:")
-    messages = client.get_messages(limit=5)
-    print(json.dumps(messages, indent=2))
+    _demo(WhatsAppClient(args.base_url), send_to=args.to if args.send_test_text else None)
     
     print("\n✅ Test completed!")
     print("\n📚 Usage Examples:")